@@ -8,10 +8,14 @@ install_requires = [
     'vispy',
     'mercantile',
     'requests',
-    'requests_cache',
     'pillow',
 ]
 
+extras_require = {
+    # faster PNG decoding
+    'fast': ['pyspng'],
+}
+
 with open("README.md", "r", encoding='utf-8') as f:
     long_description = f.read()
 
@@ -41,6 +45,7 @@ setuptools.setup(
     ],
     entry_points=entry_points,
     install_requires=install_requires,
+    extras_require=extras_require,
     package_data={
         'vismap': ['cat-killer-256x256.png'],
     }
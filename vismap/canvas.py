@@ -18,3 +18,9 @@ class Canvas(scene.SceneCanvas):
         self.view = self.central_widget.add_widget(MapView(tile_provider))
         self.freeze()
 
+    def render(self, *args, **kwargs):
+        # render() draws the scene without emitting the draw event the view
+        # adds its tiles on, so add them all first.
+        self.view.flush_pending_images()
+        return super().render(*args, **kwargs)
+
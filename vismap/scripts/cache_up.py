@@ -51,23 +51,20 @@ def _get_clargs():
         help='Tile Provider (by name) to retrieve.',
         default='StamenTonerInverted',
     )
-
-    p.add_argument(
-        '--verbose',
-        action='store_true',
-        default='StamenTonerInverted',
-    )
     return p.parse_args()
 
 
 def _get_tile(provider, z, x, y):
     # we created this function so that we don't keep the results of retrieving
-    # the tiles around.  If we just called provider.get_tile(z, x, y) in the
-    # apply_async of the thread pool, the responses would not have been garbage
-    # collected until the threadpool was joined.
+    # the tiles around.  If we just called provider.get_tile_bytes(z, x, y) in
+    # the apply_async of the thread pool, the responses would not have been
+    # garbage collected until the threadpool was joined.
+    #
+    # Only the bytes are fetched: they are what the cache stores, so there's
+    # no point in decoding them.
 
     # Important: intentionally not returning a value.
-    provider.get_tile(z, x, y)
+    provider.get_tile_bytes(z, x, y)
 
 
 def main():
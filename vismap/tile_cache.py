@@ -0,0 +1,171 @@
+"""
+On-disk cache of tile images, backed by SQLite.
+
+Tiles are stored exactly as the tile server sent them (usually PNG bytes),
+keyed by a string identifying the tile, normally its URL.  Once the
+database grows past its size limit, the least recently used tiles are
+evicted.  Tiles older than the
+cache's expiration time are not returned, unless stale tiles are asked for
+explicitly (for example, because the tile server can't be reached).
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+
+# bumped whenever _SCHEMA changes; older caches are thrown away.
+_SCHEMA_VERSION = 1
+
+_SCHEMA = """
+DROP TABLE IF EXISTS tiles;
+CREATE TABLE tiles (
+    key TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    fetch_time REAL NOT NULL,
+    access_time REAL NOT NULL
+);
+CREATE INDEX tiles_access_time ON tiles (access_time);
+PRAGMA user_version = {};
+""".format(_SCHEMA_VERSION)
+
+
+class DiskTileCache:
+    """LRU cache of tile images in a SQLite database at ``path``.
+
+    The cache is safe to use from multiple threads.  When a ``put`` makes the
+    total size of the stored tiles exceed ``max_bytes``, the least recently
+    used tiles are deleted until it fits again.  Tiles stored more than
+    ``expire_after`` (a datetime.timedelta, or None for never) ago are
+    considered stale.
+
+    A tile's access time is only rewritten when it is more than
+    ``access_resolution`` seconds old, so that most cache hits are a single
+    read; least recently used is only as precise as that.
+
+    Several processes may share the database (say, the cache_up script and
+    a running map).  Each keeps a running total of the size of the tiles,
+    which misses the others' writes, so the total is re-read from the
+    database whenever someone else has written to it, and before evicting
+    anything.
+    """
+    access_resolution = 3600
+
+    def __init__(self, path, max_bytes=2**30, expire_after=None):
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        self.expire_after = expire_after
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # a single connection shared by every thread; the lock serializes
+        # access to it.
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            version, = self._conn.execute('PRAGMA user_version').fetchone()
+            if version != _SCHEMA_VERSION:
+                self._conn.executescript(_SCHEMA)
+            self._size = self._stored_size()
+            self._data_version = self._get_data_version()
+
+    def get(self, key, stale=False):
+        """Return the cached bytes of the tile stored under ``key``, or None
+        if it isn't cached or is stale.  If ``stale`` is True, stale tiles are
+        returned too.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data, fetch_time, access_time FROM tiles '
+                'WHERE key = ?',
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            data, fetch_time, access_time = row
+            if not stale and self.expire_after is not None:
+                if now - fetch_time > self.expire_after.total_seconds():
+                    return None
+            if now - access_time > self.access_resolution:
+                self._conn.execute(
+                    'UPDATE tiles SET access_time = ? WHERE key = ?',
+                    (now, key),
+                )
+        return data
+
+    def put(self, key, data):
+        """Store the bytes of a tile under ``key``, evicting old tiles if
+        needed.
+        """
+        size = len(data)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute(
+                'SELECT size FROM tiles WHERE key = ?', (key,)).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?, ?)',
+                (key, data, size, now, now),
+            )
+            self._size += size - (old[0] if old else 0)
+            data_version = self._get_data_version()
+            if data_version != self._data_version:
+                # another process changed the cache; our total is off
+                self._data_version = data_version
+                self._size = self._stored_size()
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _get_data_version(self):
+        """Return SQLite's data_version, which changes whenever another
+        connection commits to the database.  Must be called with the lock
+        held.
+        """
+        version, = self._conn.execute('PRAGMA data_version').fetchone()
+        return version
+
+    def _stored_size(self):
+        """Return the total size of the stored tiles, according to the
+        database.  Must be called with the lock held.
+        """
+        size, = self._conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM tiles').fetchone()
+        return size
+
+    def _evict(self):
+        """Delete least recently used tiles until the cache fits in
+        ``max_bytes``.  Must be called with the lock held.
+        """
+        # one write transaction, so that other processes using the cache
+        # can't change what's stored between counting and deleting.
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._size = self._stored_size()
+            excess = self._size - self.max_bytes
+            freed = 0
+            rowids = []
+            rows = self._conn.execute(
+                'SELECT rowid, size FROM tiles ORDER BY access_time')
+            for rowid, size in rows:
+                if freed >= excess:
+                    break
+                rowids.append((rowid,))
+                freed += size
+            rows.close()
+            self._conn.executemany(
+                'DELETE FROM tiles WHERE rowid = ?', rowids)
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+        self._conn.execute('COMMIT')
+        self._size -= freed
+
+    def __len__(self):
+        with self._lock:
+            count, = self._conn.execute('SELECT COUNT(*) FROM tiles').fetchone()
+        return count
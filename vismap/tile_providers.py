@@ -4,6 +4,7 @@ Classes for retrieving tiles from different providers.
 """
 
 import abc
+import datetime
 import io
 import logging
 import os
@@ -11,16 +12,54 @@ import random
 
 import numpy as np
 import PIL.Image
-from requests_cache import CachedSession
+import requests
+import requests.adapters
 
-from . import fs_cache
+try:
+    # optional; decodes PNGs straight into an array, without going through
+    # a PIL image.
+    import pyspng
+except ImportError:
+    pyspng = None
+
+from .tile_cache import DiskTileCache
 
 
 CACHE_DIR = os.path.expanduser( '~/.vismap-tiles')
+# Size limit of the on-disk tile cache, in bytes.
+CACHE_MAX_BYTES = 2**30
+# How long cached tiles are used before fetching them again.  Tile URLs are
+# stable, so the tiles behind them rarely change.
+CACHE_EXPIRE_AFTER = datetime.timedelta(days=365)
 
 logger = logging.getLogger(__name__)
 
-_session = CachedSession(backend=fs_cache.FSCache(CACHE_DIR))
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Default number of tiles a MapView fetches at once.
+MAX_PARALLEL = 16
+# Connections kept alive to each tile server, shared by every MapView; enough
+# for four views fetching MAX_PARALLEL tiles each, as in examples/grid.py.
+# This is only an upper bound: connections are opened as they're needed.
+MAX_CONNECTIONS = 4 * MAX_PARALLEL
+
+# Tiles are cached on disk by tile_cache, so the session itself doesn't cache
+# anything.
+_session = requests.Session()
+# The session is shared by every fetching thread, of every MapView.  Its
+# connection pool has to be big enough that each of them gets to keep its
+# connection alive; requests only keeps 10 per host by default, and throws
+# away connections beyond that.  The pool is sized once, here, since
+# replacing the adapter later would drop every pooled connection.
+_adapter = requests.adapters.HTTPAdapter(pool_maxsize=MAX_CONNECTIONS)
+_session.mount('http://', _adapter)
+_session.mount('https://', _adapter)
+
+tile_cache = DiskTileCache(
+    os.path.join(CACHE_DIR, 'tiles.sqlite'),
+    max_bytes=CACHE_MAX_BYTES,
+    expire_after=CACHE_EXPIRE_AFTER,
+)
 
 
 # mapping of class name: TileProvider.  Built up with register() decorator.
@@ -37,11 +76,32 @@ class TileNotFoundError(Exception):
     pass
 
 
+def _spng_can_decode(img_bytes):
+    """Return whether pyspng decodes ``img_bytes`` to the same RGBA pixels
+    as PIL: an 8-bit PNG without a tRNS chunk.  pyspng ignores tRNS
+    transparency, and scales 16-bit samples differently than PIL.
+    """
+    if img_bytes[:8] != _PNG_SIGNATURE:
+        return False
+    # the IHDR chunk always comes first; byte 24 is its bit depth.
+    if img_bytes[24:25] != b'\x08':
+        return False
+    # tRNS, if present, comes before the image data.
+    idat = img_bytes.find(b'IDAT')
+    return b'tRNS' not in img_bytes[:idat]
+
+
 class TileProvider(abc.ABC):
     """Class which knows how to get tiles, given a z,x,y location
 
 
     """
+    # how many tiles may be requested from the tile server at the same time
+    max_parallel = MAX_PARALLEL
+    # image formats the tile server sends, so PIL doesn't have to try every
+    # format it knows; None means let PIL figure it out.
+    formats = ('PNG',)
+
     @abc.abstractmethod
     def url(self, z, x, y):
         """
@@ -49,23 +109,74 @@ class TileProvider(abc.ABC):
 
         """
 
-    def get_tile(self, z, x, y):
-        """Return tile as an array of rgb values"""
-        x = x % (2 ** z)
+    def cache_key(self, z, x, y):
+        """Return the key the tile is stored under in the disk cache.  By
+        default, that's the tile's URL.
+        """
+        return self.url(z, x, y)
+
+    def get_tile_bytes(self, z, x, y):
+        """Return the encoded tile image, from the disk cache if possible."""
+        # wrap around the world; same as x % 2**z, but cheaper
+        x &= (1 << z) - 1
+        key = self.cache_key(z, x, y)
+        img_bytes = tile_cache.get(key)
+        if img_bytes is not None:
+            return img_bytes
         url = self.url(z, x, y)
         logger.debug('retrieving tile from %s', url)
-        resp = _session.get(url)
+        # if the tile server fails us, an expired tile is better than none
+        try:
+            resp = _session.get(url)
+        except requests.RequestException:
+            img_bytes = tile_cache.get(key, stale=True)
+            if img_bytes is None:
+                raise
+            logger.debug('using stale cached tile for %s', url)
+            return img_bytes
         if resp.status_code != 200:
+            img_bytes = tile_cache.get(key, stale=True)
+            if img_bytes is not None:
+                logger.debug('using stale cached tile for %s', url)
+                return img_bytes
             msg = 'Could not retrieve tile for z={}, x={}, y={}'
             msg = msg.format(z, x, y)
             raise TileNotFoundError(msg)
         img_bytes = resp.content
-        img = PIL.Image.open(io.BytesIO(img_bytes))
-        rgba = img.convert('RGBA')
-        # flip so that when displaying with Vispy everything shows up
-        # right-side-up.
-        rgba = np.flip(rgba, 0)
-        return rgba
+        tile_cache.put(key, img_bytes)
+        return img_bytes
+
+    def get_tile(self, z, x, y):
+        """Return tile as an array of rgb values, top row first"""
+        return self.decode_tile(self.get_tile_bytes(z, x, y))
+
+    def decode_tile(self, img_bytes):
+        """Decode the bytes of a tile image into an array of rgb values"""
+        if pyspng is not None and _spng_can_decode(img_bytes):
+            try:
+                return pyspng.load(img_bytes, 'RGBA')
+            except RuntimeError:
+                # let PIL have a go; if the tile really is broken, it will
+                # raise something more useful.
+                pass
+        # BytesIO shares the bytes object's buffer rather than copying it.
+        # Decoding eagerly inside the with block lets the encoded image go
+        # as soon as its pixels exist, instead of when the array does.
+        f = io.BytesIO(img_bytes)
+        try:
+            img = PIL.Image.open(f, formats=self.formats)
+        except PIL.UnidentifiedImageError:
+            # not what the server usually sends; try everything
+            img = PIL.Image.open(f)
+        with img:
+            img.load()
+            # convert() always makes a new image, even if nothing needs
+            # converting
+            if img.mode != 'RGBA':
+                img = img.convert('RGBA')
+            # Rows stay in image order, top row first.  The MapView flips
+            # tiles in their transform instead of copying them here.
+            return np.asarray(img)
 
     @property
     @abc.abstractmethod
@@ -77,9 +188,7 @@ class TileProvider(abc.ABC):
 class StamenBase(TileProvider):
     """The basic Stamen maps"""
     def url(self, z, x, y):
-        url = 'http://c.tile.stamen.com/{}/{}/{}/{}.png'
-        url = url.format(self.map_name, z, x, y)
-        return url
+        return f'http://c.tile.stamen.com/{self.map_name}/{z}/{x}/{y}.png'
 
     attribution = 'Map tiles by Stamen Design, under CC BY 3.0. Data '
     attribution += 'by OpenStreetMap, under ODbL'
@@ -113,9 +222,8 @@ class MapStackBase(TileProvider):
     """
 
     def url(self, z, x, y):
-        url = 'http://d.sm.mapstack.stamen.com/{}/{}/{}/{}.png'
-        url = url.format(self.transform, z, x, y)
-        return url
+        base = 'http://d.sm.mapstack.stamen.com'
+        return f'{base}/{self.transform}/{z}/{x}/{y}.png'
 
     attribution = 'Tiles by MapBox, Data © OpenStreetMap contributors\n'
     attribution += 'Tiles by Stamen Design, under CC-BY 3.0 Data © '
@@ -149,8 +257,8 @@ class CartodbBase(TileProvider):
     on the class"""
 
     def url(self, z, x, y):
-        base = 'http://cartodb-basemaps-1.global.ssl.fastly.net/{}/{}/{}/{}.png'
-        return base.format(self.map_name, z, x, y)
+        base = 'http://cartodb-basemaps-1.global.ssl.fastly.net'
+        return f'{base}/{self.map_name}/{z}/{x}/{y}.png'
 
     attribution = 'Copyright OpenStreetMap; Copyright CartoDB'
 
@@ -162,8 +270,7 @@ class CartodbDark(CartodbBase):
 @register
 class Mapnik(TileProvider):
     def url(self, z, x, y):
-        url = 'http://a.tile.openstreetmap.org/{}/{}/{}.png'
-        return url.format(z, x, y)
+        return f'http://a.tile.openstreetmap.org/{z}/{x}/{y}.png'
 
     attribution = 'Copyright OpenStreetMap'
 
@@ -171,8 +278,7 @@ class Mapnik(TileProvider):
 @register
 class OpenTopMap(TileProvider):
     def url(self, z, x, y):
-        url = 'http://a.tile.opentopomap.org/{}/{}/{}.png'
-        return url.format(z, x, y)
+        return f'http://a.tile.opentopomap.org/{z}/{x}/{y}.png'
 
     attribution = ('Map data: Copyright OpenStreetMap, SRTM \n '
                    'Map style: Copyright OpenTopoMap CC-BY-SA')
@@ -180,10 +286,12 @@ class OpenTopMap(TileProvider):
 
 @register
 class EsriWorldImagery(TileProvider):
+    formats = ('JPEG',)
+
     def url(self, z, x, y):
-        url ='http://server.arcgisonline.com/ArcGIS/rest/services' \
-             '/World_Imagery/MapServer/tile/{}/{}/{}'
-        return url.format(z, y, x)
+        base = 'http://server.arcgisonline.com/ArcGIS/rest/services' \
+               '/World_Imagery/MapServer/tile'
+        return f'{base}/{z}/{y}/{x}'
 
     attribution = \
         'Tiles copyright Esri -- Source: Esri, i-cubed, USDA, USGS, AEX, ' \
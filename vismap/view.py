@@ -3,11 +3,13 @@ Contains the MapView, which automatically grabs the correct tiles based on
 the current zoom level.
 """
 
+import collections
+import concurrent.futures
 import enum
 import functools
 import logging
+import math
 import os
-import multiprocessing.pool
 import queue
 import threading
 
@@ -18,13 +20,66 @@ import vispy
 from vispy import scene
 from vispy.visuals import transforms as transforms
 
-from .tile_providers import StamenTonerInverted, TileNotFoundError
-from .transforms import RelativeMercatorTransform, MercatorTransform
+from .tile_providers import (
+    StamenTonerInverted,
+    TileNotFoundError,
+    TileProvider,
+)
+from .transforms import R, RelativeMercatorTransform, MercatorTransform
 
 _CAT_FILE = os.path.join(os.path.dirname(__file__),
                          'cat-killer-256x256.png')
 
 
+def _merc_to_lnglat(x, y):
+    """Convert Web Mercator x, y (in meters) to a (longitude, latitude)
+    tuple.  Same as mercantile.lnglat, without its overhead."""
+    lng = math.degrees(x / R)
+    lat = math.degrees(2 * math.atan(math.exp(y / R)) - math.pi / 2)
+    return lng, lat
+
+
+def _merc_to_tile(x, y, z):
+    """Return the (x, y) index of the tile at zoom ``z`` containing the Web
+    Mercator point ``x``, ``y`` (in meters).  Tiles are evenly spaced in
+    Mercator units, so there's no need to go through longitude/latitude.
+    Like mercantile.tile, the index is clamped to the world.
+    """
+    n = 1 << z
+    # width of the world in Mercator units is 2 * pi * R
+    tiles_per_meter = n / (2 * math.pi * R)
+    xtile = math.floor((x + math.pi * R) * tiles_per_meter)
+    ytile = math.floor((math.pi * R - y) * tiles_per_meter)
+    xtile = min(max(xtile, 0), n - 1)
+    ytile = min(max(ytile, 0), n - 1)
+    return xtile, ytile
+
+
+def _tile_origin(z, x, y):
+    """Return (left, top, size) of the tile at z, x, y, in Mercator meters.
+
+    Every tile at zoom ``z`` is the same size, so this is plain arithmetic;
+    it gives the same answer as mercantile.xy_bounds.
+    """
+    size = 2 * math.pi * R / (1 << z)
+    left = x * size - math.pi * R
+    top = math.pi * R - y * size
+    return left, top, size
+
+
+@functools.lru_cache(maxsize=1)
+def _load_cat():
+    """Decode the cat picture once, as an array shared by every MapView.
+
+    The array is read-only, since every missing tile gets this same one.
+    """
+    with open(_CAT_FILE, 'rb') as f:
+        im = PIL.Image.open(f)
+        rgb = np.asarray(im)
+    rgb.flags.writeable = False
+    return rgb
+
+
 class OnMissing(enum.Enum):
     """What action to take whenever a tile is missing"""
     # raise an exception
@@ -41,22 +96,67 @@ logger = logging.getLogger(__name__)
 class MapView(scene.ViewBox):
     # x, y bounds for Web Mercator.
     _web_mercator_bounds = 20037508.342789244
-
-    def __init__(self, tile_provider=StamenTonerInverted(), *args, **kwargs):
+    # number of decoded tiles to keep in memory; a 256x256 RGBA tile is
+    # 256 KiB.
+    decoded_cache_size = 256
+    # number of threads decoding tile images
+    decode_threads = min(4, os.cpu_count() or 1)
+    # number of removed tile images kept around to be reused for new tiles
+    max_spare_images = 64
+
+    def __init__(self, tile_provider=StamenTonerInverted(), *args,
+                 max_parallel=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.unfreeze()
         # this lock is needed any time the scene graph is touched, or nodes of the
-        # scene graph are transformed.
+        # scene graph are transformed.  Tiles are only ever added to or removed
+        # from the scene on the GUI thread (see _attach_pending_images); the
+        # tile_controller thread just builds images that aren't part of the
+        # scene yet, which needs no lock.
         self.scene_lock = threading.Lock()
         self._enabled = True
 
         self._images = {}
+        # Held while changing self._images or self._tile_rect, and while
+        # changing the tile provider or enabling/disabling the map, so that
+        # a fill running on the tile_controller thread can't add tiles that
+        # are no longer wanted.
+        self._tiles_lock = threading.RLock()
+        # {z: scene.Node}; every tile image at zoom z is a child of the layer
+        # for z, which does the scaling shared by all of them.  See
+        # _tile_layer.
+        self._tile_layers = {}
+        # (z, x0, x1, y0, y1) of the tiles in self._images, once all of them
+        # have been added; None otherwise.
+        self._tile_rect = None
         # mapping of {(lnglat, radius): vispy.scene.visuals.Ellipse}
         # circles drawn around specific points
         self._circles = {}
         self._tile_provider = tile_provider
-        # TODO: how big to make thread pool?
-        self.request_pool = multiprocessing.pool.ThreadPool(10)
+        # Recently decoded tiles, so that going back to them doesn't touch the
+        # disk or decode anything: {(z, x, y): rgb}, least recently used
+        # first.  Cleared whenever the tile provider changes.
+        self._decoded = collections.OrderedDict()
+        self._decoded_lock = threading.Lock()
+        # snapshot of the camera's visible area and everything derived from
+        # it; see the _viewport property.  Thrown away by the camera every
+        # time its transform changes.
+        self._viewport_cache = None
+        # number of tiles fetched at once; by default, whatever the tile
+        # provider is comfortable with.  All MapViews share
+        # tile_providers.MAX_CONNECTIONS kept-alive connections per server.
+        if max_parallel is None:
+            max_parallel = tile_provider.max_parallel
+        self.request_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_parallel,
+            thread_name_prefix='tile-net',
+        )
+        # Decoding happens on its own threads, so that the fetching threads
+        # can go right back to waiting on the network.
+        self.decode_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.decode_threads,
+            thread_name_prefix='tile-decode',
+        )
 
         # cal factor done with math.  At zoom level 0, the mercator units / pixel
         # is 156543.  So our zom calibration factor needs to be based on that
@@ -104,6 +204,18 @@ class MapView(scene.ViewBox):
         self.camera.rect = rect
         self.last_event = None
         self.marker_size = 10
+        # Pending changes to the scene, as (key, image) pairs: images that
+        # have been created but not added to the scene yet, or, when key is
+        # None, images to take out of the scene.  They are applied in order
+        # when the canvas draws, adding at most tiles_per_frame images each
+        # time, so that a burst of new tiles doesn't upload all of its
+        # textures in a single frame.
+        self._pending_images = collections.deque()
+        self.tiles_per_frame = 4
+        # Images taken out of the scene, ready to show another tile.  Reusing
+        # one keeps its GL texture, so a new tile of the same size is just an
+        # upload instead of a new texture.
+        self._spare_images = collections.deque()
         self._queue = queue.Queue()
         self.worker_thread = threading.Thread(
             target=self.tile_controller,
@@ -115,24 +227,49 @@ class MapView(scene.ViewBox):
         self.tile_provider = tile_provider
         self.freeze()
 
-    def tile_controller(self, queue):
+    def tile_controller(self, cmd_queue):
         """Background thread for doing the right thing with tiles"""
         while True:
-            try:
-                data = queue.get()
-                if data is None:
+            commands = [cmd_queue.get()]
+            # grab everything else that piled up while we were busy, so that
+            # superseded commands can be skipped.
+            while True:
+                try:
+                    commands.append(cmd_queue.get_nowait())
+                except queue.Empty:
                     break
-                cmd = data['cmd']
-                if cmd == 'call_method':
-                    method = getattr(self, data['name'])
-                    args = data.get('args', [])
-                    kwargs = data.get('kwargs', {})
-                    method(*args, **kwargs)
-            except BaseException:
-                # want to keep the loop going
-                msg = 'tile_controller thread error on data {}'
-                msg = msg.format(data)
-                logger.exception(msg)
+            for data in self._coalesce(commands):
+                if data is None:
+                    return
+                try:
+                    cmd = data['cmd']
+                    if cmd == 'call_method':
+                        method = getattr(self, data['name'])
+                        args = data.get('args', [])
+                        kwargs = data.get('kwargs', {})
+                        method(*args, **kwargs)
+                except BaseException:
+                    # want to keep the loop going
+                    msg = 'tile_controller thread error on data {}'
+                    msg = msg.format(data)
+                    logger.exception(msg)
+
+    @staticmethod
+    def _coalesce(commands):
+        """Drop every _add_tiles_for_zoom command that is followed by another
+        one; only the latest viewport needs to be filled.  Other commands are
+        kept in order.
+        """
+        def fills_view(data):
+            return (data is not None
+                    and data.get('name') == '_add_tiles_for_zoom')
+
+        latest = None
+        for i, data in enumerate(commands):
+            if fills_view(data):
+                latest = i
+        return [data for i, data in enumerate(commands)
+                if i == latest or not fills_view(data)]
 
     @property
     def tile_provider(self):
@@ -140,9 +277,13 @@ class MapView(scene.ViewBox):
 
     @tile_provider.setter
     def tile_provider(self, provider):
-        self._tile_provider = provider
-        for im in list(self._images):
-            self.remove_tile(im)
+        # swapping the provider and dropping its tiles happens at once, so a
+        # fill that's still running can't sneak one of the old tiles in.
+        with self._tiles_lock:
+            with self._decoded_lock:
+                self._tile_provider = provider
+                self._decoded.clear()
+            self.remove_tiles(list(self._images))
         self.add_tiles_for_current_zoom()
         self._attribution.text = provider.attribution
 
@@ -161,7 +302,7 @@ class MapView(scene.ViewBox):
                 canvas_x, canvas_y, *_ = event.pos
                 width, height = self.size
 
-                rect = self.camera._real_rect
+                rect = self._viewport['rect']
 
                 x_interp = canvas_x / width
                 y_interp = canvas_y / height
@@ -169,7 +310,7 @@ class MapView(scene.ViewBox):
                 view_y = rect.top + y_interp * (rect.bottom - rect.top)
                 self.longlat_text.pos = (view_x, view_y)
                 msg = '((long {:f} lat {:f}) ({:f}, {:f})'
-                lng, lat = mercantile.lnglat(view_x, view_y)
+                lng, lat = _merc_to_lnglat(view_x, view_y)
                 msg = msg.format(lng, lat, view_x, view_y)
                 self.longlat_text.text = msg
                 self.marker.set_data(np.array([[view_x, view_y]]),
@@ -177,19 +318,25 @@ class MapView(scene.ViewBox):
                 self.marker.visible = True
 
     @property
-    def mercator_scale(self):
-        """Get mercator units per pixel of the canvas"""
+    def _viewport(self):
+        """Snapshot of the current viewport, as a dict with keys ``rect``,
+        ``merc_per_pixel``, ``tile_zoom_level``, ``nw``, and ``se``.
+
+        The snapshot is computed once per viewport change and shared by
+        everything that needs it until the camera moves again.
+        """
+        viewport = self._viewport_cache
+        if viewport is None:
+            viewport = self._compute_viewport()
+            self._viewport_cache = viewport
+        return viewport
+
+    def _compute_viewport(self):
         # figure out the right zoom level by the number of pixels per mercator units
         canvas_width, _ = self.size
-        _real_rect = self.camera._real_rect
+        rect = self.camera._real_rect
         # units are Mercator
-        scene_width = _real_rect.width
-        merc_per_pixel = scene_width / canvas_width
-        return merc_per_pixel
-
-    @property
-    def tile_zoom_level(self):
-        merc_per_pixel = self.mercator_scale
+        merc_per_pixel = rect.width / canvas_width
 
         zoom = -np.log2(merc_per_pixel)
         # account for a good "known zoom" level
@@ -197,16 +344,40 @@ class MapView(scene.ViewBox):
         zoom = int(zoom)
         if zoom < 0:
             zoom = 0
-        return zoom
+
+        x0, y0 = _merc_to_tile(rect.left, rect.top, zoom)
+        northwest = mercantile.Tile(x0, y0, zoom)
+        x1, y1 = _merc_to_tile(rect.right, rect.bottom, zoom)
+        southeast = mercantile.Tile(x1, y1, zoom)
+        return {
+            'rect': rect,
+            'merc_per_pixel': merc_per_pixel,
+            'tile_zoom_level': zoom,
+            'nw': northwest,
+            'se': southeast,
+        }
+
+    @property
+    def mercator_scale(self):
+        """Get mercator units per pixel of the canvas"""
+        return self._viewport['merc_per_pixel']
+
+    @property
+    def tile_zoom_level(self):
+        return self._viewport['tile_zoom_level']
 
     def get_st_transform(self, z, x, y):
         """
         Return the STTransform for the current zoom, x, and y tile.
+
+        Tile images have their top row first, so the transform flips them:
+        the y scale is negative and the image is anchored at the tile's top
+        edge.
         """
 
-        bbox = mercantile.xy_bounds(x, y, z)
-        scale = (bbox.right - bbox.left) / 256
-        scale = scale, scale, 1
+        left, top, size = _tile_origin(z, x, y)
+        scale = size / 256
+        scale = scale, -scale, 1
 
         # place the tiles up high, so that everything will show up correctly
         # TODO: figure out why setting z super high works!  Not sure if it's
@@ -215,17 +386,9 @@ class MapView(scene.ViewBox):
         # but it doesn't work.
         # If we ever switch to a different type of camera probably nothing
         # will work.
-        translate = bbox.left, bbox.bottom, 9e5 - z
+        translate = left, top, 9e5 - z
         return transforms.STTransform(scale=scale, translate=translate)
 
-    def _fix_y(self, y):
-        """Make sure ``y`` fits in the Web Mercator bounds."""
-        if y >= self._web_mercator_bounds:
-            return self._web_mercator_bounds - 1
-        elif y <= -self._web_mercator_bounds:
-            return -self._web_mercator_bounds + 1
-        return y
-
     @property
     def current_bounds(self):
         """Return the tile index bounds of the current view.
@@ -233,23 +396,15 @@ class MapView(scene.ViewBox):
         Returns a tuple of two mercantile.Tile instances: the northwest and
         southeast corners.
         """
-        rect = self.camera._real_rect
-        z = self.tile_zoom_level
-
-        x0, y0 = rect.left, rect.top
-        y0 = self._fix_y(y0)
-        lng0, lat0 = mercantile.lnglat(x0, y0)
-        northwest = mercantile.tile(lng0, lat0, z)
-
-        x1, y1 = rect.right, rect.bottom
-        y1 = self._fix_y(y1)
-        lng1, lat1 = mercantile.lnglat(x1, y1)
-        southeast = mercantile.tile(lng1, lat1, z)
-        return northwest, southeast
+        viewport = self._viewport
+        return viewport['nw'], viewport['se']
 
     def _add_tiles_for_zoom(self, zoom_level=None, bounds=None, extra=1):
         """
-        (Synchronously) add tiles to the canvas specified zoom. and bounds.
+        Fetch the tiles for the specified zoom and bounds, waiting for them.
+
+        The images are queued to be added to the scene on upcoming draws, or
+        all at once by flush_pending_images; this doesn't touch the scene.
 
         if zoom_level is None, use ``self.current_zoom``
 
@@ -266,133 +421,342 @@ class MapView(scene.ViewBox):
         y0 = northwest.y - extra
         y1 = southeast.y + extra
 
+        max_index = (1 << z) - 1
         if y0 < 0:
             y0 = 0
-        if y1 > 2**z - 1:
-            y1 = 2**z - 1
-
-        if (z, x0, x1, y0, y1) not in self._images:
-            rgb = self._merge_tiles(z, x0, y0, x1, y1)
-            image = self._add_rgb_as_image(rgb, z, x0, y1)
-            self._images[z, x0, x1, y0, y1] = image
-
-        self.scene.events.block()
-        try:
-            for key in list(self._images):
-                z = key[0]
-                if z != zoom_level:
-                    self.remove_tile(key)
-        finally:
-            self.scene.events.unblock()
+        if y1 > max_index:
+            y1 = max_index
+
+        tile_rect = z, x0, x1, y0, y1
+        provider = self.tile_provider
+        with self._tiles_lock:
+            if not self._enabled or tile_rect == self._tile_rect:
+                # nothing to show, or already showing exactly these tiles
+                return
+            # until this fill completes, whatever rect was recorded is wrong
+            self._tile_rect = None
+
+        # every tile is its own image, keyed by (z, x, y).  Only fetch the
+        # ones that aren't shown yet, and only remove the ones that are no
+        # longer needed.
+        xs, ys = np.meshgrid(
+            np.arange(x0, x1 + 1),
+            np.arange(y0, y1 + 1),
+            indexing='ij',
+        )
+        wanted = {(z, x, y)
+                  for x, y in zip(xs.ravel().tolist(), ys.ravel().tolist())}
+        new = wanted - self._images.keys()
+
+        # Tiles go through two stages: their bytes are fetched on the
+        # request pool, then decoded on the decode pool.  This maps each
+        # future to the (z, x, y) tile it's for and whether its result is the
+        # decoded tile.
+        # providers that override get_tile get it called as a single stage
+        two_stage = type(provider).get_tile is TileProvider.get_tile
+        stages = {}
+        for key in new:
+            rgb = self._cached_tile(key)
+            if rgb is not None:
+                image = self._add_rgb_as_image(rgb, *key)
+                if not self._show_tile(provider, key, image):
+                    self._spare_image(image)
+                    for future in stages:
+                        future.cancel()
+                    return
+                continue
+            if two_stage:
+                future = self.request_pool.submit(provider.get_tile_bytes, *key)
+            else:
+                future = self.request_pool.submit(provider.get_tile, *key)
+            stages[future] = key, not two_stage
+
+        # show each tile as soon as it's decoded
+        complete = True
+        pending = set(stages)
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                key, decoded = stages.pop(future)
+                try:
+                    result = future.result()
+                except TileNotFoundError as e:
+                    rgb = self._missing_tile(key, OnMissing.REPLACE_WITH_CAT, e)
+                except Exception:
+                    logger.exception('could not get tile %s', key)
+                    complete = False
+                    continue
+                else:
+                    if not decoded:
+                        decode = self.decode_pool.submit(
+                            provider.decode_tile, result)
+                        stages[decode] = key, True
+                        pending.add(decode)
+                        continue
+                    rgb = result
+                    self._cache_tile(provider, key, rgb)
+                image = self._add_rgb_as_image(rgb, *key)
+                if not self._show_tile(provider, key, image):
+                    # the tile provider changed or the map was disabled
+                    # while fetching; whatever is still coming is useless.
+                    self._spare_image(image)
+                    for future in pending:
+                        future.cancel()
+                    return
+
+        with self._tiles_lock:
+            if not self._is_current(provider):
+                return
+            # work out what's stale only now: the GUI thread may have
+            # removed tiles while these were being fetched.
+            self.remove_tiles(self._images.keys() - wanted)
+            # if a tile failed, try again next time we're asked for this rect
+            if complete:
+                self._tile_rect = tile_rect
+
+    def _is_current(self, provider):
+        """Return whether tiles from ``provider`` should still be shown."""
+        return self._enabled and provider is self._tile_provider
+
+    def _show_tile(self, provider, key, image):
+        """Show the image of a tile from ``provider``, unless the tile
+        provider has been replaced or the map disabled in the meantime.
+        Return whether the image was shown.
+        """
+        with self._tiles_lock:
+            if not self._is_current(provider):
+                return False
+            self._show_image(key, image)
+            return True
 
     def remove_tile(self, key):
         """Remove the tile from the scene.
 
-        ``key`` must be a key in self._images
+        ``key`` is a key in self._images; if it isn't, nothing happens.
         """
-        im = self._images.pop(key)
-        with self.scene_lock:
-            im.parent = None
+        self.remove_tiles([key])
+
+    def remove_tiles(self, keys):
+        """Remove several tiles from the scene at once.
+
+        The images are taken out of the scene on the next draw, after any
+        images that were queued before them have been added; that way, old
+        tiles stay visible until the tiles replacing them show up.
+
+        Keys that aren't in self._images (anymore) are ignored.
+        """
+        with self._tiles_lock:
+            images = [self._images.pop(key, None) for key in keys]
+            images = [im for im in images if im is not None]
+            if not images:
+                return
+            # whatever was being shown is no longer complete
+            self._tile_rect = None
+            for im in images:
+                self._pending_images.append((None, im))
+        self.update()
 
     def add_tiles_for_current_zoom(self):
         """
         Fill the current view with tiles.  Does the actual operation in the
         background.
         """
+        viewport = self._viewport
+        bounds = viewport['nw'], viewport['se']
         self._queue.put({
             'cmd': 'call_method',
             'name': '_add_tiles_for_zoom',
-            'args': [self.tile_zoom_level, self.current_bounds]
+            'args': [viewport['tile_zoom_level'], bounds]
         })
 
     @property
     def scene_images(self):
         """Return the images that are part of the scene graph.  If the code
-        is bug-free, the images here and the values of self._images should be
-        equal.
+        is bug-free, the images here plus the pending images should equal the
+        values of self._images.
         """
         with self.scene_lock:
-            c = self.children[0].children
-            return [x for x in c if isinstance(x, scene.visuals.Image)]
-
-    def _merge_tiles(self, z, x0, y0, x1, y1):
-        """Merge range of tiles to form a single image."""
-        requests = []
-        x_range = range(x0, x1 + 1)
-        y_range = range(y1, y0 - 1, -1)
-        for x in x_range:
-            for y in y_range:
-                requests.append((z, x, y, OnMissing.REPLACE_WITH_CAT))
-        results = self.request_pool.starmap(self.get_tile, requests)
-
-        # iterate over results, which will be exactly the same size as the
-        # number of requests made
-        it = iter(results)
-        rows = []
-        for x in range(x0, x1 + 1):
-            row = []
-            for y in range(y1, y0 - 1, -1):
-                row.append(next(it))
-            rows.append(np.concatenate(row))
-        new_img = np.concatenate(rows, 1)
-        return new_img
-
-    def get_tile(self, z, x, y, missing=OnMissing.RAISE):
+            return [x for layer in self._tile_layers.values()
+                    for x in layer.children
+                    if isinstance(x, scene.visuals.Image)]
+
+    def get_tile(self, z, x, y, missing=OnMissing.RAISE, provider=None):
         """Return RGB array of tile at specified zoom, x, and y.
 
         If the tile for the specified zoom, x, and y cannot be found, raises a
         TileNotFoundError. Unless replace_missing_with_cat == True; then, return
         a picture of a cat.
+
+        The tile comes from ``provider``, or the current tile provider if it's
+        None.
         """
+        if provider is None:
+            provider = self.tile_provider
+        key = z, x, y
+        if provider is self.tile_provider:
+            rgb = self._cached_tile(key)
+            if rgb is not None:
+                return rgb
         try:
-            rgb = self.tile_provider.get_tile(z, x, y)
-        except TileNotFoundError:
-            if missing == OnMissing.RAISE:
-                raise
-            elif missing == OnMissing.IGNORE:
-                return
-            elif missing == OnMissing.REPLACE_WITH_CAT:
-                logger.warning('replacing %s with a cat.  Meow!', (z, x, y))
-                rgb = self._get_cat()
-            else:
-                raise
+            rgb = provider.get_tile(z, x, y)
+        except TileNotFoundError as e:
+            return self._missing_tile(key, missing, e)
+        self._cache_tile(provider, key, rgb)
         return rgb
 
-    @functools.lru_cache(maxsize=1)
+    def _missing_tile(self, key, missing, error):
+        """Return what to use in place of the tile at ``key``, which raised
+        the TileNotFoundError ``error``.
+        """
+        if missing == OnMissing.IGNORE:
+            return
+        elif missing == OnMissing.REPLACE_WITH_CAT:
+            logger.warning('replacing %s with a cat.  Meow!', key)
+            return self._get_cat()
+        raise error
+
+    def _cached_tile(self, key):
+        """Return the decoded tile at ``key`` if it's in memory, else None."""
+        with self._decoded_lock:
+            rgb = self._decoded.get(key)
+            if rgb is not None:
+                self._decoded.move_to_end(key)
+        return rgb
+
+    def _cache_tile(self, provider, key, rgb):
+        """Keep the decoded tile in memory, unless it came from a tile
+        provider that has since been replaced.
+        """
+        with self._decoded_lock:
+            if provider is not self._tile_provider:
+                return
+            self._decoded[key] = rgb
+            self._decoded.move_to_end(key)
+            while len(self._decoded) > self.decoded_cache_size:
+                self._decoded.popitem(last=False)
+
     def _get_cat(self):
-        with open(_CAT_FILE, 'rb') as f:
-            im = PIL.Image.open(f)
-            rgb = np.array(im)
-        flipped = np.flip(rgb, 0)
-        return flipped
+        return _load_cat()
 
     def _add_rgb_as_image(self, rgb, z, x, y):
-        """Create image, and apply appropriate transform to it."""
-        with self.scene_lock:
-            # Note: we're not adding the image to the scene yet, so that it
-            # won't be drawn until we generate the correct transform.  We're
-            # passing parent=None to be explicit about it.
-            image = scene.visuals.Image(
-                rgb,
-                interpolation='hanning',
-                method='subdivide',
-                parent=None,
-            )
-            transform = self.get_st_transform(z, x, y)
-            image.transform = transform
-            image.parent = self.scene
+        """Create image, and apply appropriate transform to it.
+
+        The image is not part of the scene yet; see _show_image.  Until it
+        is, no other thread can reach it, so no lock is taken here.
+
+        The image's own transform only moves it to its place in the tile
+        grid, in pixels; the zoom level's layer does the rest.
+
+        A spare image is reused if there is one.  Spare images are out of
+        the scene too, so they are just as safe to touch here.
+        """
+        translate = x * 256, y * 256, 0
+        try:
+            image = self._spare_images.pop()
+        except IndexError:
+            pass
+        else:
+            image.set_data(rgb)
+            image.transform.translate = translate
+            return image
+        # Note: we're not adding the image to the scene yet, so that it
+        # won't be drawn until we generate the correct transform.  We're
+        # passing parent=None to be explicit about it.
+        image = scene.visuals.Image(
+            rgb,
+            interpolation='hanning',
+            method='subdivide',
+            parent=None,
+        )
+        transform = transforms.STTransform(translate=translate)
+        image.transform = transform
         return image
 
+    def _tile_layer(self, z):
+        """Return the scene node holding the tiles of zoom level ``z``,
+        creating it if needed.  Must be called with the scene lock held.
+        """
+        layer = self._tile_layers.get(z)
+        if layer is None:
+            layer = scene.Node(parent=self.scene)
+            # tile (0, 0) sits at the origin of the layer's pixel grid, so
+            # its transform is the one every tile at this zoom shares.
+            layer.transform = self.get_st_transform(z, 0, 0)
+            self._tile_layers[z] = layer
+        return layer
+
+    def _spare_image(self, image):
+        """Keep ``image``, which is out of the scene, for reuse by
+        _add_rgb_as_image, unless there are enough spare images already.
+        """
+        if len(self._spare_images) < self.max_spare_images:
+            self._spare_images.append(image)
+
+    def _show_image(self, key, image):
+        """Record ``image`` under ``key`` in self._images, and schedule it to
+        be added to the scene on an upcoming draw.
+        """
+        self._images[key] = image
+        self._pending_images.append((key, image))
+        self.update()
+
+    def on_canvas_change(self, event):
+        if event.old is not None:
+            event.old.events.draw.disconnect(self._attach_pending_images)
+        if event.new is not None:
+            event.new.events.draw.connect(self._attach_pending_images,
+                                          position='first')
+
+    def _attach_pending_images(self, event):
+        """Apply pending scene changes, adding up to tiles_per_frame images
+        to the scene.  Runs on the canvas's draw event, before the scene is
+        drawn.
+        """
+        self.flush_pending_images(self.tiles_per_frame)
+
+    def flush_pending_images(self, limit=None):
+        """Apply pending scene changes now, adding at most ``limit`` images
+        to the scene (all of them if ``limit`` is None).  Must be called on
+        the GUI thread.
+
+        Normally this happens bit by bit as the canvas draws.
+        SceneCanvas.render() doesn't emit the canvas's draw event, though, so
+        call this first when rendering offscreen (vismap.Canvas.render does).
+        """
+        attached = 0
+        with self.scene_lock:
+            while self._pending_images and (limit is None
+                                            or attached < limit):
+                key, image = self._pending_images.popleft()
+                if key is None:
+                    image.parent = None
+                    self._spare_image(image)
+                # the image may have been removed while it was waiting
+                elif self._images.get(key) is image:
+                    image.parent = self._tile_layer(key[0])
+                    attached += 1
+        if self._pending_images:
+            self.update()
+
     def _add_tile(self, z, x, y, missing=OnMissing.RAISE):
         if (z, x, y) in self._images:
             im = self._images[z, x, y]
-            if im not in self.scene_images:
+            # the GUI thread pops from the deque under the lock
+            with self.scene_lock:
+                pending = list(self._pending_images)
+            pending = [image for key, image in pending if key is not None]
+            if im not in self.scene_images and im not in pending:
                 logger.error('_images dict out of sync with scene children')
             else:
                 return
-        rgb = self.get_tile(z, x, y, missing)
+        provider = self.tile_provider
+        rgb = self.get_tile(z, x, y, missing, provider=provider)
         im = self._add_rgb_as_image(rgb, z, x, y)
-        self._images[z, x, y] = im
+        # the provider may have been replaced, or the map disabled, while
+        # the tile was being fetched
+        if not self._show_tile(provider, (z, x, y), im):
+            self._spare_image(im)
 
     def add_tile(self, z, x, y, missing=OnMissing.RAISE):
         """Add tile to the canvas as an image.
@@ -416,15 +780,14 @@ class MapView(scene.ViewBox):
 
     @map_enabled.setter
     def map_enabled(self, enabled):
-        self._enabled = enabled
+        with self._tiles_lock:
+            self._enabled = enabled
+            if not enabled:
+                self.remove_tiles(list(self._images))
 
         self._attribution.visible = enabled
         if enabled:
             self.add_tiles_for_current_zoom()
-        else:
-            images = list(self._images.keys())
-            for im in images:
-                self.remove_tile(im)
 
     def circle(self, longlat, radius, border_color=(1, 1, 1), color=(1, 1, 1, 0)):
         """Add a circle centere at ``center`` of radius ``radius``
@@ -483,16 +846,22 @@ class MapView(scene.ViewBox):
 
 
 class TileCamera(scene.PanZoomCamera):
+    # the tiles covering the view when tiles were last requested
+    _last_tiles = None
+
+    def _update_transform(self):
+        super()._update_transform()
+        # the viewport moved, so the view's snapshot of it is stale.
+        view = self._viewbox
+        if view is not None:
+            view._viewport_cache = None
+
     def viewbox_mouse_event(self, event):
         view = self.parent.parent
         with view.scene_lock:
             super().viewbox_mouse_event(event)
             if not view.map_enabled:
                 return
-            # if the tile command queue has anything in it, let's just get the
-            # heck out of here; this prevents a hugely unresponsive deal.
-            if not view._queue.empty():
-                return
             # figure out if we need an update; if the mouse is moving, but no key
             # is held down, we don't need to update.
             needs_update = False
@@ -507,4 +876,12 @@ class TileCamera(scene.PanZoomCamera):
                 elif 2 in event.buttons and not modifiers:
                     needs_update = True
             if needs_update:
-                view.add_tiles_for_current_zoom()
+                # mouse moves fire far more often than the view crosses a
+                # tile boundary; only ask for tiles when the set of tiles
+                # covering the view changes, or the last fill didn't finish.
+                viewport = view._viewport
+                tiles = (viewport['tile_zoom_level'],
+                         viewport['nw'], viewport['se'])
+                if tiles != self._last_tiles or view._tile_rect is None:
+                    self._last_tiles = tiles
+                    view.add_tiles_for_current_zoom()